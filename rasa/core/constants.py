@@ -14,6 +14,13 @@ DEFAULT_REQUEST_TIMEOUT = 60 * 5  # 5 minutes
 
 DEFAULT_LOCK_LIFETIME = 60  # in seconds
 
+# initial wait between two attempts to acquire a ticket lock (in seconds)
+DEFAULT_INITIAL_LOCK_WAIT = 0.05
+
+# cap for the exponentially growing wait between lock acquisition attempts
+# (in seconds)
+DEFAULT_MAX_LOCK_WAIT = 2.0
+
 REQUESTED_SLOT = "requested_slot"
 
 # slots for knowledge base
@@ -11,6 +11,9 @@ NO_TICKET_ISSUED = -1  # index of latest issued ticket if no tickets exist
 
 
 class Ticket:
+    # tickets are allocated on every lock access, so keep them slim
+    __slots__ = ("number", "expires")
+
     def __init__(self, number: int, expires: float) -> None:
         self.number = number
         self.expires = expires
@@ -33,7 +36,7 @@ class Ticket:
         return cls(number=data["number"], expires=data["expires"])
 
     def __repr__(self) -> Text:
-        return "Ticket(number: {}, expires: {})".format(self.number, self.expires)
+        return f"Ticket(number: {self.number}, expires: {self.expires})"
 
 
 class TicketLock:
@@ -44,6 +47,8 @@ class TicketLock:
     http://pages.cs.wisc.edu/~remzi/OSTEP/threads-locks.pdf#page=13
     """
 
+    __slots__ = ("conversation_id", "tickets")
+
     def __init__(
         self, conversation_id: Text, tickets: Optional[Deque[Ticket]] = None
     ) -> None:
@@ -54,13 +59,13 @@ class TicketLock:
     def from_dict(cls, data: Dict[Text, Any]) -> "TicketLock":
         """Create `TicketLock` from dictionary."""
 
-        tickets = [Ticket.from_dict(json.loads(d)) for d in data.get("tickets")]
+        tickets = [Ticket.from_dict(d) for d in data.get("tickets")]
         return cls(data.get("conversation_id"), deque(tickets))
 
     def dumps(self) -> Text:
         """Return json dump of `TicketLock`."""
 
-        tickets = [ticket.dumps() for ticket in self.tickets]
+        tickets = [ticket.as_dict() for ticket in self.tickets]
         return json.dumps(dict(conversation_id=self.conversation_id, tickets=tickets))
 
     def is_locked(self, ticket_number: int) -> bool:
@@ -1,14 +1,34 @@
 import asyncio
-import json
+import functools
 import logging
+import math
 import os
-from typing import Text, Optional, Union, AsyncGenerator
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Text, Optional, Tuple, Union, AsyncGenerator
+
+from contextlib import asynccontextmanager
+
+from rasa.core.constants import (
+    DEFAULT_LOCK_LIFETIME,
+    DEFAULT_INITIAL_LOCK_WAIT,
+    DEFAULT_MAX_LOCK_WAIT,
+)
+from rasa.core.lock import Ticket, TicketLock, NO_TICKET_ISSUED
+from rasa.utils.endpoints import EndpointConfig
 
-from async_generator import asynccontextmanager
+try:
+    import redis
+except ImportError:
+    redis = None
 
-from rasa.core.constants import DEFAULT_LOCK_LIFETIME
-from rasa.core.lock import TicketLock, NO_TICKET_ISSUED
-from rasa.utils.endpoints import EndpointConfig
+try:
+    # asynchronous client, available from redis-py 4.2 on
+    from redis import asyncio as aioredis
+except ImportError:
+    aioredis = None
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +36,187 @@ ACCEPTED_LOCK_STORES = ["in_memory", "redis"]
 
 LOCK_LIFETIME = int(os.environ.get("TICKET_LOCK_LIFETIME", 0)) or DEFAULT_LOCK_LIFETIME
 
+# prefix of the channel on which lock releases for a conversation are announced
+LOCK_RELEASE_CHANNEL_PREFIX = "lock:"
+
+# prefix of the per-ticket list keys used to wake the next waiter via BLPOP
+# (must match the literal used in `_ADVANCE_SERVING_FRAGMENT`)
+LOCK_NOTIFICATION_KEY_PREFIX = "notif:"
+
+# fields of the Redis hash in which the ticket lock of a conversation is stored
+SERVING_FIELD = "serving"  # number of the ticket that is currently served
+LAST_ISSUED_FIELD = "next"  # number of the ticket that was issued last
+TICKET_EXPIRY_FIELD_PREFIX = "exp:"  # expiry timestamp of ticket `exp:<number>`
+
+# The scripts below render ticket numbers with `string.format('%d', ...)`
+# when building field and key names: the Lua 5.1 embedded in Redis
+# concatenates the number 1 as '1', but Lua 5.3 (used by fakeredis in the
+# tests) would yield '1.0' and the field names would never match.
+
+# Issue a new ticket by incrementing the issuance counter and recording the
+# ticket's expiry timestamp (ARGV[1]). The first issued ticket is served
+# immediately. The key's time to live is extended to ARGV[2] seconds if
+# necessary so that abandoned locks are eventually evicted but live tickets
+# are never cut short. Keys written by Rasa versions before the hash-based
+# schema hold a plain string value - `HINCRBY` on those would fail with
+# `WRONGTYPE` forever, so they are dropped first (any tickets they contained
+# are long stale by upgrade time).
+ISSUE_TICKET_LUA = """
+if redis.call('TYPE', KEYS[1]).ok ~= 'hash' then
+    redis.call('DEL', KEYS[1])
+end
+local ticket = redis.call('HINCRBY', KEYS[1], 'next', 1)
+redis.call('HSETNX', KEYS[1], 'serving', ticket)
+redis.call('HSET', KEYS[1], 'exp:' .. string.format('%d', ticket), ARGV[1])
+if redis.call('TTL', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return ticket
+"""
+
+# Advance `serving` past all tickets that have been removed or whose expiry
+# timestamp lies before ARGV[1], announcing the new `serving` on channel
+# ARGV[2] if it changed. Live tickets are never skipped, so the fragment is
+# safe to run at any time. Besides the pub/sub announcement, a wakeup token
+# is pushed onto the notification list of the newly served ticket so that
+# exactly the right waiter's BLPOP returns; the list is trimmed to one entry
+# and expires on its own in case the waiter is already gone.
+_ADVANCE_SERVING_FRAGMENT = """
+local last = tonumber(redis.call('HGET', KEYS[1], 'next')) or -1
+local serving = tonumber(redis.call('HGET', KEYS[1], 'serving'))
+local advanced = false
+while serving ~= nil and serving <= last do
+    local expiry = redis.call('HGET', KEYS[1], 'exp:' .. string.format('%d', serving))
+    if expiry and tonumber(expiry) > tonumber(ARGV[1]) then
+        break
+    end
+    redis.call('HDEL', KEYS[1], 'exp:' .. string.format('%d', serving))
+    serving = redis.call('HINCRBY', KEYS[1], 'serving', 1)
+    advanced = true
+end
+if advanced then
+    redis.call('PUBLISH', ARGV[2], serving)
+    local notification = 'notif:' .. KEYS[1] .. ':' .. string.format('%d', serving)
+    redis.call('LPUSH', notification, serving)
+    redis.call('LTRIM', notification, 0, 0)
+    redis.call('EXPIRE', notification, 60)
+end
+"""
+
+ADVANCE_SERVING_LUA = _ADVANCE_SERVING_FRAGMENT + "return serving\n"
+
+# Remove the ticket with number ARGV[3], then advance `serving` as above.
+# Tickets below the current `serving` counter have already been served - a
+# release for one of them is stale (e.g. issued by a caller that lost its
+# lock long ago) and must not modify the lock, or `serving` could be pushed
+# past a legitimate holder.
+_FINISH_SERVING_FRAGMENT = (
+    """
+local finished = tonumber(ARGV[3])
+local stale = false
+local serving_now = tonumber(redis.call('HGET', KEYS[1], 'serving'))
+if serving_now ~= nil and finished < serving_now then
+    stale = true
+else
+    redis.call('HDEL', KEYS[1], 'exp:' .. string.format('%d', finished))
+end
+"""
+    + _ADVANCE_SERVING_FRAGMENT
+)
+
+# returns whether the release was stale and therefore ignored
+FINISH_SERVING_LUA = _FINISH_SERVING_FRAGMENT + "return stale and 1 or 0\n"
+
+# Finish serving ticket ARGV[3] and delete the whole lock if no tickets
+# remain, all in one round-trip. Returns a pair of flags: whether the lock
+# was deleted and whether the release was stale.
+CLEANUP_LUA = (
+    _FINISH_SERVING_FRAGMENT
+    + """
+if stale then
+    return {0, 1}
+end
+local remaining = 0
+for _, field in ipairs(redis.call('HKEYS', KEYS[1])) do
+    if string.sub(field, 1, 4) == 'exp:' then
+        remaining = remaining + 1
+    end
+end
+if remaining == 0 then
+    redis.call('DEL', KEYS[1])
+    return {1, 0}
+end
+return {0, 0}
+"""
+)
+
+# Record ticket ARGV[1] (with expiry timestamp ARGV[2]) as issued on a node
+# that did not assign the number itself: raise the issuance counter if it
+# lags behind and initialise or lower `serving` in case tickets arrive out
+# of order, so the lowest outstanding ticket is always the one served.
+# Legacy non-hash keys are dropped as in `ISSUE_TICKET_LUA`, and the key's
+# time to live is extended to ARGV[3] seconds if necessary.
+REPLICATE_TICKET_LUA = """
+if redis.call('TYPE', KEYS[1]).ok ~= 'hash' then
+    redis.call('DEL', KEYS[1])
+end
+local ticket = tonumber(ARGV[1])
+local last = tonumber(redis.call('HGET', KEYS[1], 'next')) or 0
+if ticket > last then
+    redis.call('HSET', KEYS[1], 'next', ticket)
+end
+local serving = tonumber(redis.call('HGET', KEYS[1], 'serving'))
+if serving == nil or ticket < serving then
+    redis.call('HSET', KEYS[1], 'serving', ticket)
+end
+redis.call('HSET', KEYS[1], 'exp:' .. string.format('%d', ticket), ARGV[2])
+if redis.call('TTL', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+"""
+
+# Compare the `serving` counter against ticket ARGV[1] entirely server-side,
+# so waiters can poll without transferring or rebuilding the lock. Strict
+# equality is required: a counter beyond the ticket means the ticket expired
+# and its holder must not enter. Returns -1 if no lock exists.
+IS_TICKET_SERVED_LUA = """
+local serving = redis.call('HGET', KEYS[1], 'serving')
+if not serving then
+    return -1
+end
+return tonumber(serving) == tonumber(ARGV[1]) and 1 or 0
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def _connection_pool(
+    host: Text,
+    port: int,
+    db: int,
+    password: Optional[Text],
+    use_ssl: bool,
+    max_connections: int,
+):
+    """Get the blocking connection pool for a Redis endpoint.
+
+    Memoized so that all lock stores created for the same endpoint - e.g.
+    one per loaded agent - share a single pool instead of each opening their
+    own sockets. Uses the asynchronous client's pool when available and the
+    synchronous one otherwise.
+    """
+
+    client_module = aioredis if aioredis is not None else redis
+    return client_module.BlockingConnectionPool(
+        host=host,
+        port=port,
+        db=db,
+        password=password,
+        connection_class=(
+            client_module.SSLConnection if use_ssl else client_module.Connection
+        ),
+        max_connections=max_connections,
+    )
+
 
 # noinspection PyUnresolvedReferences
 class LockError(Exception):
@@ -50,15 +251,14 @@ class LockStore:
         else:
             logger.debug(
                 "Could not load built-in `LockStore`, which needs to be of "
-                "type: {}. Trying to load `LockStore` from module path '{}' "
-                "instead."
-                "".format(store.type, ", ".join(ACCEPTED_LOCK_STORES), store.type)
+                "type: %s. Trying to load `LockStore` from module path '%s' "
+                "instead.",
+                ", ".join(ACCEPTED_LOCK_STORES),
+                store.type,
             )
             lock_store = LockStore.load_lock_store_from_module_path(store.type)
 
-        logger.debug(
-            "Connected to lock store '{}'.".format(lock_store.__class__.__name__)
-        )
+        logger.debug("Connected to lock store '%s'.", lock_store.__class__.__name__)
 
         return lock_store
 
@@ -71,9 +271,7 @@ class LockStore:
         try:
             return class_from_module_path(module_path)
         except ImportError:
-            raise ImportError(
-                "Cannot retrieve `LockStore` from path '{}'.".format(module_path)
-            )
+            raise ImportError(f"Cannot retrieve `LockStore` from path '{module_path}'.")
 
     @staticmethod
     def create_lock(conversation_id: Text) -> TicketLock:
@@ -81,22 +279,41 @@ class LockStore:
 
         return TicketLock(conversation_id)
 
-    def get_lock(self, conversation_id: Text) -> Optional[TicketLock]:
+    async def get_lock(self, conversation_id: Text) -> Optional[TicketLock]:
         """Fetch lock for `conversation_id` from storage."""
 
         raise NotImplementedError
 
-    def delete_lock(self, conversation_id: Text) -> None:
+    async def get_locks(self, conversation_ids: List[Text]) -> Dict[Text, TicketLock]:
+        """Fetch the locks of several conversations at once.
+
+        Stores that support batched reads should override this method to
+        avoid one storage round-trip per conversation.
+
+        Returns:
+             Mapping of conversation ID to lock, for the conversations that
+             currently have one.
+        """
+
+        locks = {}
+        for conversation_id in conversation_ids:
+            lock = await self.get_lock(conversation_id)
+            if lock:
+                locks[conversation_id] = lock
+
+        return locks
+
+    async def delete_lock(self, conversation_id: Text) -> None:
         """Delete lock for `conversation_id` from storage."""
 
         raise NotImplementedError
 
-    def save_lock(self, lock: TicketLock) -> None:
+    async def save_lock(self, lock: TicketLock) -> None:
         """Commit `lock` to storage."""
 
         raise NotImplementedError
 
-    def issue_ticket(
+    async def issue_ticket(
         self, conversation_id: Text, lock_lifetime: Union[float, int] = LOCK_LIFETIME
     ) -> int:
         """Issue new ticket with `lock_lifetime` for lock associated with
@@ -105,12 +322,12 @@ class LockStore:
         Creates a new lock if none is found.
         """
 
-        lock = self.get_or_create_lock(conversation_id)
+        lock = await self.get_or_create_lock(conversation_id)
         ticket = lock.issue_ticket(lock_lifetime)
 
         while True:
             try:
-                self.ensure_ticket_available(lock)
+                await self.ensure_ticket_available(lock)
                 break
             except TicketExistsError:
                 # issue a new ticket if current ticket number has been issued twice
@@ -119,7 +336,7 @@ class LockStore:
                 )
                 ticket = lock.issue_ticket(lock_lifetime)
 
-        self.save_lock(lock)
+        await self.save_lock(lock)
 
         return ticket
 
@@ -128,114 +345,228 @@ class LockStore:
         self,
         conversation_id: Text,
         lock_lifetime: int = LOCK_LIFETIME,
-        wait_time_in_seconds: Union[int, float] = 1,
+        wait_time_in_seconds: Union[int, float] = DEFAULT_INITIAL_LOCK_WAIT,
+        max_wait_time_in_seconds: Union[int, float] = DEFAULT_MAX_LOCK_WAIT,
+        timeout_in_seconds: Optional[Union[int, float]] = None,
     ) -> AsyncGenerator[TicketLock, None]:
         """Acquire lock with lifetime `lock_lifetime`for `conversation_id`.
 
-        Try acquiring lock with a wait time of `wait_time_in_seconds` seconds
-        between attempts. Raise a `LockError` if lock has expired.
+        Try acquiring lock with an initial wait time of `wait_time_in_seconds`
+        seconds between attempts. The wait time doubles after every failed
+        attempt up to a cap of `max_wait_time_in_seconds`. Raise a `LockError`
+        if the lock has expired, or if it could not be acquired within
+        `timeout_in_seconds` seconds (`lock_lifetime` if not specified -
+        waiting any longer is pointless because the issued ticket has expired
+        by then).
         """
 
-        ticket = self.issue_ticket(conversation_id, lock_lifetime)
+        ticket = await self.issue_ticket(conversation_id, lock_lifetime)
+
+        if timeout_in_seconds is None:
+            timeout_in_seconds = lock_lifetime
 
         try:
             yield await self._acquire_lock(
-                conversation_id, ticket, wait_time_in_seconds
+                conversation_id,
+                ticket,
+                wait_time_in_seconds,
+                max_wait_time_in_seconds,
+                timeout_in_seconds,
             )
 
         finally:
-            self.cleanup(conversation_id, ticket)
+            await self.cleanup(conversation_id, ticket)
 
     async def _acquire_lock(
         self,
         conversation_id: Text,
         ticket: int,
-        wait_time_in_seconds: Union[int, float],
+        initial_wait: Union[int, float] = DEFAULT_INITIAL_LOCK_WAIT,
+        max_wait: Union[int, float] = DEFAULT_MAX_LOCK_WAIT,
+        timeout_in_seconds: Union[int, float] = LOCK_LIFETIME,
     ) -> TicketLock:
 
+        delay = initial_wait
+        start = time.monotonic()
         while True:
-            # fetch lock in every iteration because lock might no longer exist
-            lock = self.get_lock(conversation_id)
+            # check whether our ticket is served in every iteration because
+            # the lock might no longer exist; the full lock is only fetched
+            # once our ticket is up
+            served = await self.is_ticket_served(conversation_id, ticket)
 
             # exit loop if lock does not exist anymore (expired)
-            if not lock:
+            if served is None:
                 break
 
-            # acquire lock if it isn't locked
-            if not lock.is_locked(ticket):
-                return lock
+            if served:
+                lock = await self.get_lock(conversation_id)
+                if not lock:
+                    break
+                if not lock.is_locked(ticket):
+                    return lock
 
             logger.debug(
-                "Failed to acquire lock for conversation ID '{}'. Retrying..."
-                "".format(conversation_id)
+                "Failed to acquire lock for conversation ID '%s'. Retrying...",
+                conversation_id,
             )
 
-            # sleep and update lock
-            await asyncio.sleep(wait_time_in_seconds)
-            self.update_lock(conversation_id)
+            # wait for a release notification with capped exponential backoff
+            # and jitter as timeout so that waiters woken at the same time do
+            # not retry in lockstep, then update lock
+            wait = delay * (1 + random.uniform(-0.2, 0.2))
+            if time.monotonic() - start + wait > timeout_in_seconds:
+                raise LockError(
+                    f"Could not acquire lock for conversation_id "
+                    f"'{conversation_id}' within {timeout_in_seconds} seconds."
+                )
+
+            await self.wait_for_release(conversation_id, ticket, timeout=wait)
+            delay = min(delay * 2, max_wait)
+            await self.update_lock(conversation_id)
 
         raise LockError(
-            "Could not acquire lock for conversation_id '{}'."
-            "".format(conversation_id)
+            f"Could not acquire lock for conversation_id '{conversation_id}'."
         )
 
-    def update_lock(self, conversation_id: Text) -> None:
+    async def wait_for_release(
+        self, conversation_id: Text, ticket: int, timeout: Union[int, float]
+    ) -> bool:
+        """Wait until ticket `ticket` of `conversation_id` may be served.
+
+        Lock stores that support release notifications should override this
+        method and return early once a release has been announced. The default
+        implementation simply sleeps for `timeout` seconds.
+
+        Returns:
+             True if a release was announced, False if `timeout` was reached.
+        """
+
+        await asyncio.sleep(timeout)
+        return False
+
+    async def peek_serving(self, conversation_id: Text) -> Optional[int]:
+        """Get the number of the currently served ticket of `conversation_id`.
+
+        Cheaper than `get_lock` for stores that can read the counter without
+        materialising the whole lock.
+
+        Returns:
+             Number of the `Ticket` that is served next. None if no lock
+             exists for `conversation_id`.
+        """
+
+        lock = await self.get_lock(conversation_id)
+        if lock:
+            return lock.now_serving
+
+    async def is_ticket_served(
+        self, conversation_id: Text, ticket: int
+    ) -> Optional[bool]:
+        """Check whether `ticket` is the one currently served.
+
+        Returns:
+             True if `ticket` is being served, False if it is not (strictly -
+             a `serving` counter beyond `ticket` means the ticket has expired
+             and may not enter), None if no lock exists for `conversation_id`.
+        """
+
+        serving = await self.peek_serving(conversation_id)
+        if serving is None:
+            return None
+
+        return serving == ticket
+
+    async def update_lock(self, conversation_id: Text) -> None:
         """Fetch lock for `conversation_id`, remove expired tickets and save lock."""
 
-        lock = self.get_lock(conversation_id)
+        lock = await self.get_lock(conversation_id)
         if lock:
             lock.remove_expired_tickets()
-            self.save_lock(lock)
+            await self.save_lock(lock)
 
-    def get_or_create_lock(self, conversation_id: Text) -> TicketLock:
+    async def get_or_create_lock(self, conversation_id: Text) -> TicketLock:
         """Fetch existing lock for `conversation_id` or create a new one if
         it doesn't exist."""
 
-        existing_lock = self.get_lock(conversation_id)
+        existing_lock = await self.get_lock(conversation_id)
 
         if existing_lock:
             return existing_lock
 
         return self.create_lock(conversation_id)
 
-    def is_someone_waiting(self, conversation_id: Text) -> bool:
+    async def is_someone_waiting(self, conversation_id: Text) -> bool:
         """Return whether someone is waiting for lock associated with
         `conversation_id`."""
 
-        lock = self.get_lock(conversation_id)
+        lock = await self.get_lock(conversation_id)
         if lock:
             return lock.is_someone_waiting()
 
         return False
 
-    def finish_serving(self, conversation_id: Text, ticket_number: int) -> None:
+    async def finish_serving(self, conversation_id: Text, ticket_number: int) -> None:
         """Finish serving ticket with `ticket_number` for `conversation_id`.
 
         Removes ticket from lock and saves lock.
         """
 
-        lock = self.get_lock(conversation_id)
-        if lock:
-            lock.remove_ticket_for(ticket_number)
-            self.save_lock(lock)
+        lock = await self.get_lock(conversation_id)
+        if not lock or not self._is_valid_release(lock, ticket_number):
+            return
+
+        lock.remove_ticket_for(ticket_number)
+        await self.save_lock(lock)
 
-    def cleanup(self, conversation_id: Text, ticket_number: int) -> None:
+    async def cleanup(self, conversation_id: Text, ticket_number: int) -> None:
         """Remove lock for `conversation_id` if no one is waiting."""
 
-        self.finish_serving(conversation_id, ticket_number)
-        if not self.is_someone_waiting(conversation_id):
-            self.delete_lock(conversation_id)
+        # fetch the lock once and thread it through the whole release path
+        # instead of re-fetching it for every step
+        lock = await self.get_lock(conversation_id)
+        if not lock or not self._is_valid_release(lock, ticket_number):
+            return
+
+        lock.remove_ticket_for(ticket_number)
+        if lock.is_someone_waiting():
+            await self.save_lock(lock)
+        else:
+            await self.delete_lock(conversation_id)
+
+    @staticmethod
+    def _is_valid_release(lock: TicketLock, ticket_number: int) -> bool:
+        """Check that releasing `ticket_number` cannot corrupt `lock`.
+
+        Tickets below `now_serving` have already been served - a release for
+        one of them is stale and must leave the lock untouched, or a
+        misbehaved caller could move the lock past its legitimate holder.
+        """
+
+        if ticket_number < lock.now_serving:
+            LockStore._log_stale_release(lock.conversation_id, ticket_number)
+            return False
+
+        return True
+
+    @staticmethod
+    def _log_stale_release(conversation_id: Text, ticket_number: int) -> None:
+        logger.warning(
+            "Ignoring stale release of ticket '%s' for conversation '%s' - the "
+            "ticket is no longer being served.",
+            ticket_number,
+            conversation_id,
+        )
 
     @staticmethod
     def _log_deletion(conversation_id: Text, deletion_successful: bool) -> None:
         if deletion_successful:
-            logger.debug("Deleted lock for conversation '{}'.".format(conversation_id))
+            logger.debug("Deleted lock for conversation '%s'.", conversation_id)
         else:
             logger.debug(
-                "Could not delete lock for conversation '{}'.".format(conversation_id)
+                "Could not delete lock for conversation '%s'.", conversation_id
             )
 
-    def ensure_ticket_available(self, lock: TicketLock) -> None:
+    async def ensure_ticket_available(self, lock: TicketLock) -> None:
         """Check for duplicate tickets issued for `lock`.
 
         This function should be called before saving `lock`. Raises `TicketExistsError`
@@ -244,7 +575,7 @@ class LockStore:
         that some other process has issued a ticket for `lock` in the meantime.
         """
 
-        existing_lock = self.get_lock(lock.conversation_id)
+        existing_lock = await self.get_lock(lock.conversation_id)
         if not existing_lock or existing_lock.last_issued == NO_TICKET_ISSUED:
             # lock does not yet exist for conversation or no ticket has been issued
             return
@@ -253,13 +584,24 @@ class LockStore:
         # that of the one being acquired
         if existing_lock.last_issued != lock.last_issued:
             raise TicketExistsError(
-                "Ticket '{}' already exists for conversation ID '{}'."
-                "".format(existing_lock.last_issued, lock.conversation_id)
+                f"Ticket '{existing_lock.last_issued}' already exists for "
+                f"conversation ID '{lock.conversation_id}'."
             )
 
 
 class RedisLockStore(LockStore):
-    """Redis store for ticket locks."""
+    """Redis store for ticket locks.
+
+    The lock of a conversation is stored as a Redis hash under the
+    conversation ID, holding the `serving` and `next` ticket counters plus one
+    expiry timestamp per outstanding ticket (see the module-level field
+    constants). Counters are manipulated exclusively through Lua scripts so
+    that concurrent issuers and releasers cannot race each other.
+    """
+
+    # number of threads used to run commands of the synchronous fallback
+    # client off the event loop
+    FALLBACK_EXECUTOR_THREADS = 16
 
     def __init__(
         self,
@@ -268,42 +610,482 @@ class RedisLockStore(LockStore):
         db: int = 1,
         password: Optional[Text] = None,
         use_ssl: bool = False,
+        max_connections: int = 32,
     ):
-        import redis
+        if redis is None:
+            raise ImportError(
+                "Cannot create `RedisLockStore` because the `redis` package is "
+                "not installed. Install it with `pip install redis`."
+            )
 
-        self.red = redis.StrictRedis(
-            host=host, port=int(port), db=int(db), password=password, ssl=use_ssl
+        self.pool = _connection_pool(
+            host, int(port), int(db), password, use_ssl, int(max_connections)
         )
+        if aioredis is not None:
+            self.red = aioredis.Redis(connection_pool=self.pool)
+            self._executor = None
+        else:
+            # redis-py < 4.2 only ships the synchronous client; run its
+            # blocking round-trips on a thread pool so the event loop keeps
+            # serving other conversations in the meantime
+            self.red = redis.StrictRedis(connection_pool=self.pool)
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.FALLBACK_EXECUTOR_THREADS
+            )
+
+        self._register_scripts()
         super().__init__()
 
-    def get_lock(self, conversation_id: Text) -> Optional[TicketLock]:
-        serialised_lock = self.red.get(conversation_id)
-        if serialised_lock:
-            return TicketLock.from_dict(json.loads(serialised_lock))
+    def _register_scripts(self) -> None:
+        """Register the server-side scripts backing the store's operations."""
+
+        self._issue_ticket_script = self.red.register_script(ISSUE_TICKET_LUA)
+        self._replicate_ticket_script = self.red.register_script(REPLICATE_TICKET_LUA)
+        self._advance_serving_script = self.red.register_script(ADVANCE_SERVING_LUA)
+        self._finish_serving_script = self.red.register_script(FINISH_SERVING_LUA)
+        self._cleanup_script = self.red.register_script(CLEANUP_LUA)
+        self._is_ticket_served_script = self.red.register_script(IS_TICKET_SERVED_LUA)
+
+    async def _call(self, command, *args: Any, **kwargs: Any) -> Any:
+        """Run a client command, off-loading it to the executor if the
+        fallback client is synchronous."""
+
+        if self._executor is None:
+            return await command(*args, **kwargs)
+
+        return await asyncio.get_event_loop().run_in_executor(
+            self._executor, functools.partial(command, *args, **kwargs)
+        )
+
+    async def issue_ticket(
+        self, conversation_id: Text, lock_lifetime: Union[float, int] = LOCK_LIFETIME
+    ) -> int:
+        """Issue new ticket with `lock_lifetime` for lock associated with
+        `conversation_id`.
+
+        The ticket number is incremented server-side in a single atomic
+        round-trip, so concurrent issuers can never be handed the same ticket.
+        """
+
+        ticket = await self._call(
+            self._issue_ticket_script,
+            keys=[conversation_id],
+            args=[time.time() + lock_lifetime, int(lock_lifetime) + 1],
+        )
+        return int(ticket)
+
+    async def replicate_ticket(
+        self,
+        conversation_id: Text,
+        ticket: int,
+        expires: float,
+        lock_lifetime: Union[float, int],
+    ) -> None:
+        """Record `ticket` as issued without assigning a new number.
+
+        Used by `MultiRedisLockStore` to copy a ticket assigned on the
+        issuance node onto the remaining nodes.
+        """
+
+        await self._call(
+            self._replicate_ticket_script,
+            keys=[conversation_id],
+            args=[ticket, expires, int(lock_lifetime) + 1],
+        )
+
+    async def update_lock(self, conversation_id: Text) -> None:
+        """Advance the lock of `conversation_id` past expired tickets."""
+
+        await self._call(
+            self._advance_serving_script,
+            keys=[conversation_id],
+            args=[time.time(), self._release_channel(conversation_id)],
+        )
+
+    async def finish_serving(self, conversation_id: Text, ticket_number: int) -> None:
+        """Remove ticket `ticket_number` and advance the `serving` counter.
+
+        Stale releases of already-served tickets are rejected atomically
+        inside the script.
+        """
+
+        stale = await self._call(
+            self._finish_serving_script,
+            keys=[conversation_id],
+            args=[time.time(), self._release_channel(conversation_id), ticket_number],
+        )
+        if stale:
+            self._log_stale_release(conversation_id, ticket_number)
 
-    def delete_lock(self, conversation_id: Text) -> None:
-        deletion_successful = self.red.delete(conversation_id)
+    async def cleanup(self, conversation_id: Text, ticket_number: int) -> None:
+        """Remove lock for `conversation_id` if no one is waiting.
+
+        Finishing the ticket, checking for remaining waiters and deleting the
+        lock happen in a single atomic script, so no waiter can slip in
+        between the check and the deletion.
+        """
+
+        deleted, stale = await self._call(
+            self._cleanup_script,
+            keys=[conversation_id],
+            args=[time.time(), self._release_channel(conversation_id), ticket_number],
+        )
+        if stale:
+            self._log_stale_release(conversation_id, ticket_number)
+        if deleted:
+            self._log_deletion(conversation_id, deletion_successful=True)
+
+    async def get_lock(self, conversation_id: Text) -> Optional[TicketLock]:
+        fields = await self._call(self.red.hgetall, conversation_id)
+        if fields:
+            return self._lock_from_hash(conversation_id, fields)
+
+    async def get_locks(self, conversation_ids: List[Text]) -> Dict[Text, TicketLock]:
+        """Fetch several locks in a single pipelined round-trip."""
+
+        pipeline = self.red.pipeline(transaction=False)
+        for conversation_id in conversation_ids:
+            pipeline.hgetall(conversation_id)
+        results = await self._call(pipeline.execute)
+
+        return {
+            conversation_id: self._lock_from_hash(conversation_id, fields)
+            for conversation_id, fields in zip(conversation_ids, results)
+            if fields
+        }
+
+    async def delete_lock(self, conversation_id: Text) -> None:
+        deletion_successful = await self._call(self.red.delete, conversation_id)
         self._log_deletion(conversation_id, deletion_successful)
 
-    def save_lock(self, lock: TicketLock) -> None:
-        self.red.set(lock.conversation_id, lock.dumps())
+    async def save_lock(self, lock: TicketLock) -> None:
+        # announce the new `now_serving` together with the write so that
+        # waiters subscribed to the release channel wake up immediately, and
+        # bound the key's lifetime so abandoned locks do not linger in Redis.
+        # The delete and the rewrite must be transactional, or a concurrent
+        # issue script could create the hash in between and be clobbered
+        pipeline = self.red.pipeline(transaction=True)
+        pipeline.delete(lock.conversation_id)
+        pipeline.hset(lock.conversation_id, mapping=self._hash_from_lock(lock))
+        pipeline.expire(lock.conversation_id, self._time_to_live(lock))
+        pipeline.publish(self._release_channel(lock.conversation_id), lock.now_serving)
+        await self._call(pipeline.execute)
+
+    @staticmethod
+    def _time_to_live(lock: TicketLock) -> int:
+        """Number of seconds after which the hash of `lock` may be evicted.
+
+        Computed from the latest ticket expiry so that no live ticket is
+        evicted prematurely, with `LOCK_LIFETIME` as lower bound.
+        """
+
+        max_expiry = max((ticket.expires for ticket in lock.tickets), default=0)
+        return max(LOCK_LIFETIME, int(max_expiry - time.time()) + 1)
+
+    @staticmethod
+    def _lock_from_hash(conversation_id: Text, fields: Dict[Any, Any]) -> TicketLock:
+        """Reconstruct a `TicketLock` from the fields of its Redis hash."""
+
+        tickets = []
+        for field, value in fields.items():
+            if isinstance(field, bytes):
+                field = field.decode("utf-8")
+            if field.startswith(TICKET_EXPIRY_FIELD_PREFIX):
+                number = int(field[len(TICKET_EXPIRY_FIELD_PREFIX) :])
+                tickets.append(Ticket(number, float(value)))
+
+        tickets.sort(key=lambda ticket: ticket.number)
+        return TicketLock(conversation_id, deque(tickets))
+
+    @staticmethod
+    def _hash_from_lock(lock: TicketLock) -> Dict[Text, Any]:
+        """Turn `lock` into the fields of its Redis hash representation."""
+
+        fields = {SERVING_FIELD: lock.now_serving, LAST_ISSUED_FIELD: lock.last_issued}
+        for ticket in lock.tickets:
+            fields[TICKET_EXPIRY_FIELD_PREFIX + str(ticket.number)] = ticket.expires
+
+        return fields
+
+    async def wait_for_release(
+        self, conversation_id: Text, ticket: int, timeout: Union[int, float]
+    ) -> bool:
+        """Block until ticket `ticket` is about to be served.
+
+        Uses a blocking pop on the ticket's notification list, which the
+        release scripts push into when `serving` reaches `ticket` - so only
+        the waiter whose turn it is wakes up. Falls back to a pub/sub wait
+        for the synchronous client, and to returning after `timeout` seconds
+        if nothing is announced in the meantime.
+        """
+
+        if self._executor is None:
+            # Redis servers before 6.0 reject fractional BLPOP timeouts, so
+            # round up to whole seconds - sub-second wakeups come from the
+            # push, the timeout is only the fallback bound
+            token = await self.red.blpop(
+                self._notification_key(conversation_id, ticket),
+                timeout=max(1, math.ceil(timeout)),
+            )
+            return token is not None
+
+        def _wait() -> bool:
+            pubsub = self.red.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self._release_channel(conversation_id))
+                return pubsub.get_message(timeout=timeout) is not None
+            finally:
+                pubsub.close()
+
+        return await asyncio.get_event_loop().run_in_executor(self._executor, _wait)
+
+    async def peek_serving(self, conversation_id: Text) -> Optional[int]:
+        """Read only the `serving` counter instead of the whole lock hash."""
+
+        serving = await self._call(self.red.hget, conversation_id, SERVING_FIELD)
+        if serving is not None:
+            return int(serving)
+
+    async def is_ticket_served(
+        self, conversation_id: Text, ticket: int
+    ) -> Optional[bool]:
+        """Compare `ticket` against the `serving` counter server-side.
+
+        The reply is a single integer, so the waiter hot loop allocates no
+        `TicketLock` and transfers no lock state.
+        """
+
+        served = await self._call(
+            self._is_ticket_served_script, keys=[conversation_id], args=[ticket]
+        )
+        if served == -1:
+            return None
+
+        return bool(served)
+
+    @staticmethod
+    def _release_channel(conversation_id: Text) -> Text:
+        return LOCK_RELEASE_CHANNEL_PREFIX + conversation_id
+
+    @staticmethod
+    def _notification_key(conversation_id: Text, ticket: int) -> Text:
+        return f"{LOCK_NOTIFICATION_KEY_PREFIX}{conversation_id}:{ticket}"
+
+
+class MultiRedisLockStore(LockStore):
+    """Lock store that replicates ticket locks across several Redis nodes.
+
+    Every operation is issued to all nodes concurrently with
+    `asyncio.gather`, so latency is bounded by the slowest node instead of
+    the sum of all round-trips. Ticket numbers are assigned by the first
+    node alone and replicated to the others, so concurrent issuers can
+    never be handed the same ticket. Reads return the lock state the
+    majority of nodes agree on, falling back to the most advanced state if
+    there is no majority. This store is experimental; it trades the
+    strictness of a single node for availability when individual nodes are
+    slow.
+
+    Args:
+        nodes: list of keyword argument dictionaries, one per Redis node,
+            as accepted by `RedisLockStore`.
+    """
+
+    def __init__(self, nodes: List[Dict[Text, Any]]):
+        if not nodes:
+            raise ValueError(
+                "Cannot create `MultiRedisLockStore` without any Redis nodes."
+            )
+
+        self.stores = [RedisLockStore(**node) for node in nodes]
+        super().__init__()
+
+    async def issue_ticket(
+        self, conversation_id: Text, lock_lifetime: Union[float, int] = LOCK_LIFETIME
+    ) -> int:
+        # the first node assigns the number, serialising concurrent issuers;
+        # the remaining nodes only ever receive the already-assigned ticket,
+        # so no two callers can end up with the same one
+        ticket = await self.stores[0].issue_ticket(conversation_id, lock_lifetime)
+        expires = time.time() + lock_lifetime
+        await asyncio.gather(
+            *[
+                store.replicate_ticket(conversation_id, ticket, expires, lock_lifetime)
+                for store in self.stores[1:]
+            ]
+        )
+        return ticket
+
+    async def get_lock(self, conversation_id: Text) -> Optional[TicketLock]:
+        locks = await asyncio.gather(
+            *[store.get_lock(conversation_id) for store in self.stores]
+        )
+        return self._majority_lock([lock for lock in locks if lock])
+
+    async def delete_lock(self, conversation_id: Text) -> None:
+        await asyncio.gather(
+            *[store.delete_lock(conversation_id) for store in self.stores]
+        )
+
+    async def save_lock(self, lock: TicketLock) -> None:
+        await asyncio.gather(*[store.save_lock(lock) for store in self.stores])
+
+    async def update_lock(self, conversation_id: Text) -> None:
+        await asyncio.gather(
+            *[store.update_lock(conversation_id) for store in self.stores]
+        )
+
+    async def finish_serving(self, conversation_id: Text, ticket_number: int) -> None:
+        await asyncio.gather(
+            *[
+                store.finish_serving(conversation_id, ticket_number)
+                for store in self.stores
+            ]
+        )
+
+    async def cleanup(self, conversation_id: Text, ticket_number: int) -> None:
+        await asyncio.gather(
+            *[store.cleanup(conversation_id, ticket_number) for store in self.stores]
+        )
+
+    async def wait_for_release(
+        self, conversation_id: Text, ticket: int, timeout: Union[int, float]
+    ) -> bool:
+        # the first node announcing a release is enough to wake up
+        tasks = [
+            asyncio.ensure_future(
+                store.wait_for_release(conversation_id, ticket, timeout)
+            )
+            for store in self.stores
+        ]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+
+        return any(task.result() for task in done)
+
+    def _majority_lock(self, locks: List[TicketLock]) -> Optional[TicketLock]:
+        """Return the lock state that the majority of nodes agree on.
+
+        Every node computes ticket expiry timestamps locally, so they are
+        never byte-identical across nodes - agreement is therefore decided
+        on the conversation ID and the outstanding ticket numbers alone.
+        Falls back to the most advanced state if no state has a majority.
+        """
+
+        if not locks:
+            return None
+
+        def _state(lock: TicketLock) -> Tuple[Text, Tuple[int, ...]]:
+            return (
+                lock.conversation_id,
+                tuple(ticket.number for ticket in lock.tickets),
+            )
+
+        counts: Dict[Tuple[Text, Tuple[int, ...]], int] = {}
+        for lock in locks:
+            state = _state(lock)
+            counts[state] = counts.get(state, 0) + 1
+
+        majority_state, count = max(counts.items(), key=lambda item: item[1])
+        if count > len(self.stores) // 2:
+            return next(lock for lock in locks if _state(lock) == majority_state)
+
+        return max(locks, key=lambda lock: lock.last_issued)
 
 
 class InMemoryLockStore(LockStore):
-    """In-memory store for ticket locks."""
+    """In-memory store for ticket locks.
+
+    Locks are distributed over a fixed number of shards keyed by the hash of
+    the conversation ID. Each shard has its own `asyncio.Lock` guarding
+    ticket issuance, so issuers for the same conversation are serialised
+    while conversations in other shards proceed without contention. Waiters
+    are woken through a per-conversation `asyncio.Event` whenever the lock is
+    saved or deleted, so handing the lock to the next ticket does not have to
+    wait out the backoff timeout.
+    """
+
+    # number of shards the conversation locks are distributed over
+    NUMBER_OF_SHARDS = 32
 
     def __init__(self):
-        self.conversation_locks = {}
+        self._shards = [{} for _ in range(self.NUMBER_OF_SHARDS)]
+        self._shard_locks = [asyncio.Lock() for _ in range(self.NUMBER_OF_SHARDS)]
+        self._release_events: Dict[Text, asyncio.Event] = {}
         super().__init__()
 
-    def get_lock(self, conversation_id: Text) -> Optional[TicketLock]:
-        return self.conversation_locks.get(conversation_id)
+    @property
+    def conversation_locks(self) -> Dict[Text, TicketLock]:
+        """Merged view over the locks of all shards."""
 
-    def delete_lock(self, conversation_id: Text) -> None:
-        deleted_lock = self.conversation_locks.pop(conversation_id, None)
+        merged = {}
+        for shard in self._shards:
+            merged.update(shard)
+
+        return merged
+
+    def _shard_for(self, conversation_id: Text) -> Dict[Text, TicketLock]:
+        return self._shards[hash(conversation_id) % self.NUMBER_OF_SHARDS]
+
+    def _announce_release(self, conversation_id: Text) -> None:
+        """Wake all coroutines waiting on the lock of `conversation_id`.
+
+        The event is popped so that waiters arriving after this announcement
+        wait on a fresh one.
+        """
+
+        event = self._release_events.pop(conversation_id, None)
+        if event:
+            event.set()
+
+    async def wait_for_release(
+        self, conversation_id: Text, ticket: int, timeout: Union[int, float]
+    ) -> bool:
+        event = self._release_events.setdefault(conversation_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def issue_ticket(
+        self, conversation_id: Text, lock_lifetime: Union[float, int] = LOCK_LIFETIME
+    ) -> int:
+        # serialise issuance within the shard to close the read-modify-write
+        # race between concurrent issuers for the same conversation
+        shard_lock = self._shard_locks[hash(conversation_id) % self.NUMBER_OF_SHARDS]
+        async with shard_lock:
+            return await super().issue_ticket(conversation_id, lock_lifetime)
+
+    async def get_lock(self, conversation_id: Text) -> Optional[TicketLock]:
+        return self._shard_for(conversation_id).get(conversation_id)
+
+    async def get_locks(self, conversation_ids: List[Text]) -> Dict[Text, TicketLock]:
+        locks = {
+            conversation_id: self._shard_for(conversation_id).get(conversation_id)
+            for conversation_id in conversation_ids
+        }
+        return {
+            conversation_id: lock for conversation_id, lock in locks.items() if lock
+        }
+
+    async def delete_lock(self, conversation_id: Text) -> None:
+        deleted_lock = self._shard_for(conversation_id).pop(conversation_id, None)
+        self._announce_release(conversation_id)
         self._log_deletion(
             conversation_id, deletion_successful=deleted_lock is not None
         )
 
-    def save_lock(self, lock: TicketLock) -> None:
-        self.conversation_locks[lock.conversation_id] = lock
+    async def save_lock(self, lock: TicketLock) -> None:
+        shard = self._shard_for(lock.conversation_id)
+
+        # announce even if the dict write is skipped below - the lock is
+        # mutated in place, so the served ticket may have changed either way
+        self._announce_release(lock.conversation_id)
+
+        # `TicketLock`s are mutated in place, so the object fetched from the
+        # shard is usually the one being saved - skip the redundant dict write
+        if shard.get(lock.conversation_id) is lock:
+            return
+
+        shard[lock.conversation_id] = lock
@@ -23,7 +23,7 @@ tests_requires = [
     "nbsphinx>=0.3",
     "aioresponses~=0.6.0",
     "moto~=1.3.8",
-    "fakeredis~=1.0",
+    "fakeredis[lua]~=1.8",
 ]
 
 install_requires = [
@@ -32,7 +32,7 @@ install_requires = [
     "matplotlib~=3.0",
     "attrs>=18",
     "jsonpickle~=1.1",
-    "redis~=3.3.5",
+    "redis~=4.3",
     "pymongo[tls,srv]~=3.8",
     "numpy~=1.16",
     "scipy~=1.2",
@@ -79,7 +79,6 @@ install_requires = [
     # the below can be unpinned when python-socketio pins >=3.9.3
     "python-engineio>=3.9.3",
     "pydot~=1.4",
-    "async_generator~=1.10",
     "SQLAlchemy~=1.3.0",
     "kafka-python~=1.4",
     "sklearn-crfsuite~=0.3.6",
@@ -104,11 +103,10 @@ setup(
         "License :: OSI Approved :: Apache Software License",
         # supported python versions
         "Programming Language :: Python",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Topic :: Software Development :: Libraries",
     ],
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     packages=find_packages(exclude=["tests", "tools", "docs", "contrib"]),
     entry_points={"console_scripts": ["rasa=rasa.__main__:main"]},
     version=__version__,
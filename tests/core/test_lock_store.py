@@ -4,6 +4,7 @@ import os
 from typing import Union, Text
 from unittest.mock import patch
 
+import fakeredis.aioredis
 import numpy as np
 import pytest
 import time
@@ -14,7 +15,12 @@ from rasa.core.agent import Agent
 from rasa.core.channels import UserMessage
 from rasa.core.constants import INTENT_MESSAGE_PREFIX, DEFAULT_LOCK_LIFETIME
 from rasa.core.lock import TicketLock, Ticket
-from rasa.core.lock_store import InMemoryLockStore, LockError, TicketExistsError
+from rasa.core.lock_store import (
+    InMemoryLockStore,
+    LockError,
+    RedisLockStore,
+    TicketExistsError,
+)
 
 
 def test_issue_ticket():
@@ -52,58 +58,58 @@ def test_remove_expired_tickets():
     assert len(lock.tickets) == 1
 
 
-def test_create_lock_store():
+async def test_create_lock_store():
     lock_store = InMemoryLockStore()
     conversation_id = "my id 0"
 
     # create and lock
     lock = lock_store.create_lock(conversation_id)
-    lock_store.save_lock(lock)
-    lock = lock_store.get_lock(conversation_id)
+    await lock_store.save_lock(lock)
+    lock = await lock_store.get_lock(conversation_id)
     assert lock
     assert lock.conversation_id == conversation_id
 
 
-def test_serve_ticket():
+async def test_serve_ticket():
     lock_store = InMemoryLockStore()
     conversation_id = "my id 1"
 
     lock = lock_store.create_lock(conversation_id)
-    lock_store.save_lock(lock)
+    await lock_store.save_lock(lock)
 
     # issue ticket with long lifetime
-    ticket_0 = lock_store.issue_ticket(conversation_id, 10)
+    ticket_0 = await lock_store.issue_ticket(conversation_id, 10)
     assert ticket_0 == 0
 
-    lock = lock_store.get_lock(conversation_id)
+    lock = await lock_store.get_lock(conversation_id)
     assert lock.last_issued == ticket_0
     assert lock.now_serving == ticket_0
     assert lock.is_someone_waiting()
 
     # issue another ticket
-    ticket_1 = lock_store.issue_ticket(conversation_id, 10)
+    ticket_1 = await lock_store.issue_ticket(conversation_id, 10)
 
     # finish serving ticket_0
-    lock_store.finish_serving(conversation_id, ticket_0)
+    await lock_store.finish_serving(conversation_id, ticket_0)
 
-    lock = lock_store.get_lock(conversation_id)
+    lock = await lock_store.get_lock(conversation_id)
 
     assert lock.last_issued == ticket_1
     assert lock.now_serving == ticket_1
     assert lock.is_someone_waiting()
 
     # serve second ticket and no one should be waiting
-    lock_store.finish_serving(conversation_id, ticket_1)
+    await lock_store.finish_serving(conversation_id, ticket_1)
 
-    lock = lock_store.get_lock(conversation_id)
+    lock = await lock_store.get_lock(conversation_id)
     assert not lock.is_someone_waiting()
 
 
-def test_lock_expiration():
+async def test_lock_expiration():
     lock_store = InMemoryLockStore()
     conversation_id = "my id 2"
     lock = lock_store.create_lock(conversation_id)
-    lock_store.save_lock(lock)
+    await lock_store.save_lock(lock)
 
     # issue ticket with long lifetime
     ticket = lock.issue_ticket(10)
@@ -120,8 +126,8 @@ def test_lock_expiration():
     assert lock.issue_ticket(10) == 1
 
 
-def test_ticket_exists_error():
-    def mocked_issue_ticket(
+async def test_ticket_exists_error():
+    async def mocked_issue_ticket(
         self,
         conversation_id: Text,
         lock_lifetime: Union[float, int] = DEFAULT_LOCK_LIFETIME,
@@ -129,22 +135,179 @@ def test_ticket_exists_error():
         # mock LockStore.issue_ticket() so it issues two tickets for the same
         # conversation ID simultaneously
 
-        lock = self.get_or_create_lock(conversation_id)
+        lock = await self.get_or_create_lock(conversation_id)
         lock.issue_ticket(lock_lifetime)
-        self.save_lock(lock)
+        await self.save_lock(lock)
 
         # issue another ticket for this lock
         lock_2 = copy.deepcopy(lock)
         lock_2.tickets.append(Ticket(1, time.time() + DEFAULT_LOCK_LIFETIME))
 
-        self.ensure_ticket_available(lock_2)
+        await self.ensure_ticket_available(lock_2)
 
     lock_store = InMemoryLockStore()
     conversation_id = "my id 3"
 
     with patch.object(InMemoryLockStore, "issue_ticket", mocked_issue_ticket):
         with pytest.raises(TicketExistsError):
-            lock_store.issue_ticket(conversation_id)
+            await lock_store.issue_ticket(conversation_id)
+
+
+async def test_get_locks():
+    lock_store = InMemoryLockStore()
+    conversation_ids = ["bulk id {}".format(i) for i in range(3)]
+
+    for conversation_id in conversation_ids[:2]:
+        await lock_store.issue_ticket(conversation_id, 10)
+
+    # only conversations with a lock show up in the result
+    locks = await lock_store.get_locks(conversation_ids)
+    assert sorted(locks) == conversation_ids[:2]
+    assert all(
+        lock.conversation_id == conversation_id
+        for conversation_id, lock in locks.items()
+    )
+
+
+async def test_stale_release_is_ignored():
+    lock_store = InMemoryLockStore()
+    conversation_id = "my id 5"
+
+    ticket_0 = await lock_store.issue_ticket(conversation_id, 10)
+    ticket_1 = await lock_store.issue_ticket(conversation_id, 10)
+
+    await lock_store.finish_serving(conversation_id, ticket_0)
+
+    # releasing an already-served ticket must leave the lock untouched
+    await lock_store.finish_serving(conversation_id, ticket_0)
+    await lock_store.cleanup(conversation_id, ticket_0)
+
+    lock = await lock_store.get_lock(conversation_id)
+    assert lock
+    assert lock.now_serving == ticket_1
+    assert lock.is_someone_waiting()
+
+
+async def test_wait_for_release_is_woken_by_release():
+    lock_store = InMemoryLockStore()
+    conversation_id = "my id 6"
+
+    ticket = await lock_store.issue_ticket(conversation_id, 10)
+
+    async def finish() -> None:
+        await asyncio.sleep(0.01)
+        await lock_store.finish_serving(conversation_id, ticket)
+
+    # the waiter must be woken by the release, well before the timeout
+    start = time.time()
+    woken, _ = await asyncio.gather(
+        lock_store.wait_for_release(conversation_id, ticket + 1, timeout=5), finish()
+    )
+    assert woken
+    assert time.time() - start < 1
+
+
+async def test_concurrent_ticket_issuance():
+    lock_store = InMemoryLockStore()
+    conversation_id = "my id 4"
+
+    # concurrent issuers must never be handed the same ticket number
+    tickets = await asyncio.gather(
+        *[lock_store.issue_ticket(conversation_id, 10) for _ in range(10)]
+    )
+    assert sorted(tickets) == list(range(10))
+
+
+def _redis_lock_store() -> RedisLockStore:
+    # build the store around an in-process fakeredis server, bypassing
+    # `__init__` which would open a connection pool to a real server
+    lock_store = RedisLockStore.__new__(RedisLockStore)
+    lock_store.red = fakeredis.aioredis.FakeRedis()
+    lock_store._executor = None
+    lock_store._register_scripts()
+    return lock_store
+
+
+async def test_redis_issue_and_serve():
+    lock_store = _redis_lock_store()
+    conversation_id = "redis id 0"
+
+    ticket_0 = await lock_store.issue_ticket(conversation_id, 10)
+    ticket_1 = await lock_store.issue_ticket(conversation_id, 10)
+    assert ticket_1 == ticket_0 + 1
+
+    # the first ticket is served immediately, the second has to wait
+    assert await lock_store.is_ticket_served(conversation_id, ticket_0) is True
+    assert await lock_store.is_ticket_served(conversation_id, ticket_1) is False
+
+    await lock_store.finish_serving(conversation_id, ticket_0)
+    assert await lock_store.is_ticket_served(conversation_id, ticket_1) is True
+
+    # the release also pushed a wakeup token for the next ticket
+    assert await lock_store.wait_for_release(conversation_id, ticket_1, timeout=1)
+
+
+async def test_redis_expired_tickets_are_skipped():
+    lock_store = _redis_lock_store()
+    conversation_id = "redis id 1"
+
+    await lock_store.issue_ticket(conversation_id, 0.001)
+    ticket_1 = await lock_store.issue_ticket(conversation_id, 10)
+
+    # once the first ticket has expired, updating the lock advances
+    # `serving` to the next live ticket
+    await asyncio.sleep(0.002)
+    await lock_store.update_lock(conversation_id)
+
+    assert await lock_store.is_ticket_served(conversation_id, ticket_1) is True
+
+
+async def test_redis_cleanup():
+    lock_store = _redis_lock_store()
+    conversation_id = "redis id 2"
+
+    ticket_0 = await lock_store.issue_ticket(conversation_id, 10)
+    ticket_1 = await lock_store.issue_ticket(conversation_id, 10)
+
+    # a waiter is left, so the lock survives and serves the next ticket
+    await lock_store.cleanup(conversation_id, ticket_0)
+    lock = await lock_store.get_lock(conversation_id)
+    assert lock
+    assert lock.now_serving == ticket_1
+
+    # no one is waiting after the last ticket, so the lock is deleted
+    await lock_store.cleanup(conversation_id, ticket_1)
+    assert await lock_store.get_lock(conversation_id) is None
+
+
+async def test_redis_stale_release_is_ignored():
+    lock_store = _redis_lock_store()
+    conversation_id = "redis id 3"
+
+    ticket_0 = await lock_store.issue_ticket(conversation_id, 10)
+    ticket_1 = await lock_store.issue_ticket(conversation_id, 10)
+    await lock_store.finish_serving(conversation_id, ticket_0)
+
+    # releasing the already-served ticket again must leave the lock untouched
+    await lock_store.finish_serving(conversation_id, ticket_0)
+    await lock_store.cleanup(conversation_id, ticket_0)
+
+    assert await lock_store.is_ticket_served(conversation_id, ticket_1) is True
+
+
+async def test_redis_legacy_string_key_is_migrated():
+    lock_store = _redis_lock_store()
+    conversation_id = "redis id 4"
+
+    # lock written by the old JSON string schema of earlier Rasa versions
+    await lock_store.red.set(conversation_id, TicketLock(conversation_id).dumps())
+
+    ticket = await lock_store.issue_ticket(conversation_id, 10)
+    assert await lock_store.is_ticket_served(conversation_id, ticket) is True
+
+    lock = await lock_store.get_lock(conversation_id)
+    assert lock
+    assert [ticket_.number for ticket_ in lock.tickets] == [ticket]
 
 
 async def test_multiple_conversation_ids(default_agent: Agent):